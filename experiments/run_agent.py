@@ -61,13 +61,10 @@ class SamplingTrial(pytry.Trial):
                            length_scale=p.len_scale)
         elapsed_time = time.thread_time_ns() - start
 
-        vals = np.zeros((p.num_init_samples + budget,))
-        sample_locs = []
-        
-        for i, res in enumerate(optimizer.res):
-            vals[i] = res['target']
-            sample_locs.append(res['params'])
-            
+        vals = np.fromiter((np.asarray(res['target']).item() for res in optimizer.res),
+                           dtype=np.float64, count=len(optimizer.res))
+        sample_locs = [res['params'] for res in optimizer.res]
+
         regrets = function_maximum_value[p.function_name] - vals
         print(optimizer.max)
         
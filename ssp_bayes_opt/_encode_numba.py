@@ -0,0 +1,90 @@
+'''
+Optional numba-compiled kernels for the hot SSP encoding and acquisition
+paths.
+
+If numba is not installed the pure NumPy implementations in sspspace and
+agent are used instead, so this module must only be used after checking
+HAS_NUMBA.
+'''
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+if HAS_NUMBA:
+    @njit(parallel=True, cache=True, fastmath=True)
+    def fourier_encode(phase_matrix, scaled_x):
+        '''
+        Computes exp(1j * phase_matrix @ scaled_x.T) with the matrix product
+        and complex exponential fused in one pass, parallelized over the
+        sample points.  The inverse FFT back to the time domain is left to
+        the caller because numba does not compile np.fft.
+
+        Parameters:
+        -----------
+        phase_matrix : np.ndarray
+            A (ssp_dim, domain_dim) array of SSP frequency components.
+
+        scaled_x : np.ndarray
+            A (num_samples, domain_dim) array of lengthscale-adjusted data.
+
+        Returns:
+        --------
+        fdata : np.ndarray
+            A (ssp_dim, num_samples) complex array of Fourier coefficients.
+        '''
+        num_pts = scaled_x.shape[0]
+        ssp_dim = phase_matrix.shape[0]
+        domain_dim = phase_matrix.shape[1]
+        fdata = np.empty((ssp_dim, num_pts), dtype=np.complex128)
+        for i in prange(num_pts):
+            for k in range(ssp_dim):
+                phase = 0.
+                for p in range(domain_dim):
+                    phase += phase_matrix[k,p] * scaled_x[i,p]
+                fdata[k,i] = complex(np.cos(phase), np.sin(phase))
+        return fdata
+
+    @njit(cache=True, fastmath=True)
+    def mi_acquisition(phi, m, L, gamma, beta_inv, norm_margin):
+        '''
+        Fused negated mutual-information acquisition value and gradient,
+        mirroring the closure in SSPAgent.acquisition_func.  All
+        intermediates live in one compiled unit, so the triangular factor
+        L of the posterior covariance is the only large array read per
+        evaluation.
+
+        Parameters:
+        -----------
+        phi : np.ndarray
+            The (ssp_dim,) iterate of the acquisition optimization.
+
+        m : np.ndarray
+            The (ssp_dim,) posterior mean of the regression weights.
+
+        L : np.ndarray
+            The (ssp_dim, ssp_dim) lower Cholesky factor of the posterior
+            covariance.
+
+        gamma, beta_inv, norm_margin : float
+            The exploration state, observation noise variance, and the
+            norm at which iterates are projected back onto the SSP ball.
+
+        Returns:
+        --------
+        val, grad : float, np.ndarray
+            The negated acquisition value and its gradient w.r.t. phi.
+        '''
+        phi_norm = np.sqrt(np.dot(phi, phi))
+        if phi_norm > norm_margin:
+            phi = norm_margin * phi / phi_norm
+        u = np.dot(L.T, phi)
+        sqr = np.dot(u, u)
+        sig_phi = np.dot(L, u)
+        scale = np.sqrt(sqr + gamma + beta_inv)
+        val = -(np.dot(phi, m) + scale - np.sqrt(gamma))
+        grad = -(m + sig_phi / scale)
+        return val, grad
@@ -1,5 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import scipy.fft
 from scipy.optimize import minimize
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import KFold
@@ -12,6 +13,7 @@ from sklearn.preprocessing import StandardScaler
 
 from . import sspspace
 from . import blr
+from . import _encode_numba
 from .kernels import SincKernel
 
 import functools
@@ -39,6 +41,27 @@ def factory(agent_type, init_xs, init_ys, **kwargs):
     return agt
 
 
+def _mi_value_and_grad(phi, m, sigma, L, gamma, beta_inv):
+    '''
+    Negated mutual-information acquisition value and gradient computed in
+    one pass: the posterior covariance is read once per evaluation, through
+    the triangular factor L when one exists, and the intermediates are
+    shared between the value and the gradient.
+    '''
+    if L is None:
+        sig_phi = sigma @ phi
+        sqr = (phi.T @ sig_phi )
+    else:
+        u = L.T @ phi
+        sqr = u @ u
+        sig_phi = L @ u
+    ### end if
+    scale = np.sqrt(sqr + gamma + beta_inv)
+    val = -(phi.T @ m + scale - np.sqrt(gamma)).flatten()
+    grad = -(m.flatten() + sig_phi / scale)
+    return val, grad
+
+
 class Agent:
     def __init__(self):
         pass
@@ -99,20 +122,18 @@ class SSPAgent(Agent):
         # Encode the initial sample points 
         init_phis = self.encode(init_xs)
 
-        self.blr = blr.BayesianLinearRegression(self.ssp_space.ssp_dim)
+        self.blr = blr.BayesianLinearRegression(self.ssp_space.ssp_dim,
+                                                dtype=init_phis.dtype)
 
         self.blr.update(init_phis, np.array(init_ys))
 
         # MI params
         self.gamma_t = 0
         self.sqrt_alpha = np.log(2/1e-6)
-        
+
 #         self.init_samples = self.ssp_space.get_sample_pts_and_ssps(300**data_dim,'grid')
         self.init_samples = self.ssp_space.get_sample_pts_and_ssps(300**data_dim,'length-scale')
 
-        # Cache for the input xs.
-#         self.phis = None
-
     ### end __init__
 
     def _optimize_lengthscale(self, init_xs, init_ys):
@@ -178,9 +199,13 @@ class SSPAgent(Agent):
 
 
     def eval(self, xs):
+        '''
+        Predicts the mean, variance and exploration bonus for a batch of
+        sample points, each returned with one entry per row of xs.
+        '''
         phis = self.encode(xs)
         mu, var = self.blr.predict(phis)
-        phi = self.sqrt_alpha * (np.sqrt(var + self.gamma_t) - np.sqrt(self.gamma_t)) 
+        phi = self.sqrt_alpha * (np.sqrt(var + self.gamma_t) - np.sqrt(self.gamma_t))
         return self.scaler.inverse_transform(mu), var, phi
 
     def initial_guess(self):
@@ -194,14 +219,42 @@ class SSPAgent(Agent):
     def acquisition_func(self):
         '''
         return objective_func, jacobian_func
+
+        The objective returns (value, gradient) computed from a single
+        covariance matvec, so the jacobian slot is True for use with
+        scipy.optimize.minimize(..., jac=True).
         '''
-        # TODO: Currently returning (objective_func, None) to be fixed when 
-        # I finish the derivation
 
         optim_norm_margin = 4
 
+        # The posterior covariance only changes on update, so use the
+        # factor cached on the regression and evaluate the quadratic form
+        # and matvec through it.  cov_cholesky returns None when the
+        # covariance is not numerically positive definite, in which case
+        # fall back on the dense matrix.
+        sigma_L = self.blr.cov_cholesky()
+
+        if _encode_numba.HAS_NUMBA and sigma_L is not None:
+            # Evaluate through the compiled fused kernel.  scipy hands
+            # L-BFGS-B iterates over as float64, so present the posterior
+            # in the same type for the jit dispatch.
+            m_flat = np.ascontiguousarray(self.blr.m.flatten(), dtype=np.float64)
+            L64 = np.ascontiguousarray(sigma_L, dtype=np.float64)
+            # update accumulates gamma_t with the (1,)-shaped variance from
+            # eval, so it may be an array here; float() on that raises
+            # under NumPy >= 2.
+            def min_func(phi, m=m_flat, L=L64,
+                            gamma=np.asarray(self.gamma_t, dtype=np.float64).reshape(-1)[0],
+                            beta_inv=1/float(self.blr.beta),
+                            norm_margin=float(optim_norm_margin)):
+                return _encode_numba.mi_acquisition(phi, m, L, gamma,
+                                                    beta_inv, norm_margin)
+            return min_func, True
+        ### end if
+
         def min_func(phi, m=self.blr.m,
                         sigma=self.blr.S,
+                        L=sigma_L,
                         gamma=self.gamma_t,
                         beta_inv=1/self.blr.beta,
                         norm_margin=optim_norm_margin):
@@ -210,28 +263,9 @@ class SSPAgent(Agent):
             if phi_norm > norm_margin:
                 phi = norm_margin * phi / phi_norm
             ### end if
-            val = phi.T @ m
-            mi = np.sqrt(gamma + beta_inv + phi.T @ sigma @ phi) - np.sqrt(gamma)
-            return -(val + mi).flatten()
-
+            return _mi_value_and_grad(phi, m, sigma, L, gamma, beta_inv)
 
-        def gradient(phi, m=self.blr.m,
-                      sigma=self.blr.S,
-                      gamma=self.gamma_t,
-                      beta_inv=1/self.blr.beta,
-                      norm_margin=optim_norm_margin):
-
-            phi_norm = np.linalg.norm(phi)
-            if phi_norm > norm_margin:
-                phi = norm_margin * phi / phi_norm
-            ### end if
-            sig_phi = sigma @ phi
-            sqr = (phi.T @ sig_phi ) 
-            scale = np.sqrt(sqr + gamma + beta_inv)
-            retval = -(m.flatten() + sig_phi / scale)
-            return retval
-
-        return min_func, gradient
+        return min_func, True
     
 
     def update(self, x_t:np.ndarray, y_t:np.ndarray, sigma_t:float):
@@ -287,6 +321,9 @@ class SSPTrajectoryAgent(Agent):
         
         # Encode timestamps
         self.timestep_ssps = self.ssp_t_space.encode(np.linspace(0,traj_len,traj_len))
+        # The timestamp SSPs never change, so their spectra used when
+        # binding in encode are a constant of the agent.
+        self.timestep_ssp_ffts = np.fft.fft(self.timestep_ssps, axis=-1)
         
         # Encode the initial sample points 
         init_phis = self.encode(init_trajs)
@@ -317,29 +354,22 @@ class SSPTrajectoryAgent(Agent):
     def acquisition_func(self):
         '''
         return objective_func, jacobian_func
+
+        As in SSPAgent, the objective returns (value, gradient) in one
+        evaluation and the jacobian slot is True for use with
+        scipy.optimize.minimize(..., jac=True).
         '''
-        # TODO: Currently returning (objective_func, None) to be fixed when 
-        # I finish the derivation
+
+        sigma_L = self.blr.cov_cholesky()
 
         def min_func(phi, m=self.blr.m,
                         sigma=self.blr.S,
+                        L=sigma_L,
                         gamma=self.gamma_t,
                         beta_inv=1/self.blr.beta):
-            val = phi.T @ m
-            mi = np.sqrt(gamma + beta_inv + phi.T @ sigma @ phi) - np.sqrt(gamma)
-            return -(val + mi).flatten()
+            return _mi_value_and_grad(phi, m, sigma, L, gamma, beta_inv)
 
-
-        def gradient(phi, m=self.blr.m,
-                      sigma=self.blr.S,
-                      gamma=self.gamma_t,
-                      beta_inv=1/self.blr.beta):
-            sqr = (phi.T @ sigma @ phi) 
-            scale = np.sqrt(sqr + gamma + beta_inv)
-            retval = -(m.flatten() + sigma @ phi / scale)
-            return retval
-
-        return min_func, gradient
+        return min_func, True
     
     def update(self, x_t:np.ndarray, y_t:np.ndarray, sigma_t:float):
         '''
@@ -362,11 +392,16 @@ class SSPTrajectoryAgent(Agent):
 
     def encode(self,x):
         x = np.atleast_2d(x)
-        S = np.zeros((self.ssp_x_space.ssp_dim,x.shape[0]))
         x = x.reshape(-1,self.traj_len,self.x_dim)
-        for j in range(self.traj_len):
-            S += self.ssp_x_space.bind(self.timestep_ssps[j,:] , self.ssp_x_space.encode(x[:,j,:]))
-        return S.T
+        num_pts = x.shape[0]
+        # Encode every timestep of every trajectory in one batched call,
+        # then bind with the timestamp SSPs in the Fourier domain, where
+        # binding is an elementwise product, and sum over timesteps before
+        # a single inverse transform.
+        phis = self.ssp_x_space.encode(x.reshape(-1,self.x_dim))
+        phi_ffts = scipy.fft.fft(phis.reshape(num_pts,self.traj_len,-1), axis=-1, workers=-1)
+        S = scipy.fft.ifft(np.sum(self.timestep_ssp_ffts[None,:,:] * phi_ffts, axis=1), axis=-1, workers=-1).real
+        return S
     
         
     def decode(self,ssp):
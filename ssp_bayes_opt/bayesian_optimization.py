@@ -1,6 +1,8 @@
 import numpy as np
 import time
 
+from concurrent import futures
+
 from . import agent
 from . import sspspace
 
@@ -177,6 +179,11 @@ class BayesianOptimization:
         lbounds = self.bounds[:,0]
         ubounds = self.bounds[:,1]
 
+        # Initial conditions for the restarts are drawn from a scrambled
+        # Sobol sequence: for the same restart budget a low-discrepancy set
+        # covers the domain far more evenly than independent uniform draws.
+        restart_sampler = qmc.Sobol(d=self.data_dim, seed=self.sampling_seed)
+
         print('| iter\t | target\t | x\t |')
         print('-------------------------------')
         for t in range(n_iter):
@@ -185,33 +192,36 @@ class BayesianOptimization:
             ### TODO fix jacobian so it returns dx in x space
             optim_func, jac_func = agt.acquisition_func()
 
-            # Use optimization to find a sample location
-            solns = []
-            vals = []
-            for _ in range(num_restarts):
-               
-                x_init = np.random.uniform(low=lbounds, high=ubounds, size=(len(ubounds),))
-
-                if agent_type=='gp-matern' or agent_type=='gp-sinc':
+            # Use optimization to find a sample location.  The restarts are
+            # independent L-BFGS-B solves, so draw all the initial
+            # conditions up front and run the solves in a thread pool (the
+            # heavy NumPy/BLAS work releases the GIL).
+            if agent_type=='gp-matern' or agent_type=='gp-sinc':
+                x_inits = qmc.scale(restart_sampler.random(num_restarts),
+                                    lbounds, ubounds)
+                def run_restart(x_init):
                     # Do bounded optimization to ensure x stays in bound
-                    start = time.thread_time_ns()
                     soln = minimize(optim_func, x_init,
-                                    jac=jac_func, 
+                                    jac=jac_func,
                                     method='L-BFGS-B',
                                     bounds=self.bounds)
-                    self.times[t] = time.thread_time_ns() - start
-                    solnx = np.copy(soln.x)
-                else: ## ssp agent
-#                     phi_init = agt.encode(x_init)
-                    phi_init = agt.initial_guess()
-                    start = time.thread_time_ns()
+                    return -soln.fun, np.copy(soln.x)
+            else: ## ssp agent
+#                 x_inits = [agt.encode(x_init) for ...]
+                x_inits = [agt.initial_guess() for _ in range(num_restarts)]
+                def run_restart(phi_init):
                     soln = minimize(optim_func, phi_init,
-                                    jac=jac_func, 
+                                    jac=jac_func,
                                     method='L-BFGS-B')
-                    self.times[t] = time.thread_time_ns() - start
-                    solnx = agt.decode(np.copy(np.atleast_2d(soln.x)))
-                vals.append(-soln.fun)
-                solns.append(solnx)
+                    return -soln.fun, agt.decode(np.copy(np.atleast_2d(soln.x)))
+            ### end if agent_type
+
+            start = time.perf_counter_ns()
+            with futures.ThreadPoolExecutor(max_workers=num_restarts) as pool:
+                restart_results = list(pool.map(run_restart, x_inits))
+            self.times[t] = time.perf_counter_ns() - start
+            vals = [val for val, _ in restart_results]
+            solns = [solnx for _, solnx in restart_results]
             ## END timing section
 
             best_val_idx = np.argmax(vals)
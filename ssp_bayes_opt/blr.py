@@ -4,14 +4,16 @@ import numpy as np
 # https://maxhalford.github.io/blog/bayesian-linear-regression/
 
 class BayesianLinearRegression:
-    def __init__(self, size_in, size_out=1, alpha=0.01, beta=None):
+    def __init__(self, size_in, size_out=1, alpha=0.01, beta=None, dtype=np.float64):
         self.input_dim = size_in
         self.output_dim = size_out
-        self.S_inv = alpha * np.eye(size_in)
-        self.m = np.zeros((size_in,1))
+        self.dtype = np.dtype(dtype)
+        self.S_inv = alpha * np.eye(size_in, dtype=dtype)
+        self.m = np.zeros((size_in,1), dtype=dtype)
         self.beta = beta
         self.S = np.linalg.pinv(self.S_inv)
         self.rank_one_updates = True
+        self._S_chol = None
     ### end __init__
 
     def update(self, phis:np.ndarray, ts:np.ndarray):
@@ -22,7 +24,9 @@ class BayesianLinearRegression:
         assert len(ts.shape) > 1 and ts.shape[1] == self.output_dim, f'Expected output shape ({phis.shape[0]}, 1), got {ts.shape}'
 
         if self.beta is None:
-            self.beta = 1. / np.var(ts)
+            # Keep beta a Python float: a weak scalar under NumPy 2
+            # promotion rules, so it does not widen a float32 posterior.
+            self.beta = float(1. / np.var(ts))
         S_inv = self.S_inv + self.beta * np.dot(phis.T, phis)
         
         S = np.copy(self.S)
@@ -39,12 +43,40 @@ class BayesianLinearRegression:
         self.m = S @ (self.S_inv @ self.m + x)
         self.S_inv = S_inv
         self.S = S
+        # Targets may arrive in a wider type than the posterior; cast the
+        # state back so the configured precision survives updates.
+        if self.m.dtype != self.dtype:
+            self.m = self.m.astype(self.dtype)
+            self.S = self.S.astype(self.dtype)
+            self.S_inv = self.S_inv.astype(self.dtype)
+        ### end if
+        # The covariance changed, so any cached factorization is stale.
+        self._S_chol = None
 
         assert self.m.shape[0] == self.input_dim and self.m.shape[1] == 1
 
+    def cov_cholesky(self):
+        '''
+        Lower-triangular Cholesky factor of the posterior covariance,
+        computed lazily and cached until the next update.  Returns None if
+        the covariance is not numerically positive definite, which can
+        happen because it is maintained by rank-one updates.
+        '''
+        if self._S_chol is None:
+            try:
+                self._S_chol = np.linalg.cholesky(self.S)
+            except np.linalg.LinAlgError:
+                self._S_chol = False
+        ### end if
+        return self._S_chol if self._S_chol is not False else None
+
     def predict(self, phi):
+        '''
+        Predicts mean and variance for a batch of encoded points, both
+        shaped (num_samples,).
+        '''
         var = (1. / self.beta) + np.einsum('ij,ij->i', phi, np.dot(phi, self.S.T))
-        return np.dot(self.m.T, phi.T), var
+        return np.dot(phi, self.m).flatten(), var
 
     def sample(self):
         phi_init = None
@@ -1,13 +1,18 @@
+import functools
+
 import numpy as np
+import scipy.fft
 from scipy.stats import qmc
 from scipy.stats import special_ortho_group
 from scipy.optimize import minimize
 
 import warnings
 
+from . import _encode_numba
+
 class SSPSpace:
     def __init__(self, domain_dim: int, ssp_dim: int, axis_matrix=None, phase_matrix=None,
-                 domain_bounds=None, length_scale=1):
+                 domain_bounds=None, length_scale=1, dtype=np.float64):
         '''
         Represents a domain using spatial semantic pointers.
 
@@ -34,10 +39,16 @@ class SSPSpace:
 
         length_scale : float or np.ndarray
             Scales values before encoding.
-            
+
+        dtype : np.dtype
+            The floating point type of returned encodings.  float32 halves
+            the memory traffic of the downstream regression matvecs at a
+            precision the noisy optimization loop does not need.
+
         '''
         self.domain_dim = domain_dim
         self.ssp_dim = ssp_dim
+        self.dtype = dtype
         self.length_scale = length_scale * np.ones((self.domain_dim,1))
         
         if domain_bounds is not None:
@@ -73,12 +84,22 @@ class SSPSpace:
     def optimize_lengthscale(self, init_xs, init_ys):
         ls_0 = self.length_scale
         self.length_scale = np.ones((self.domain_dim,1))
-        
+
+        # The lengthscale only enters the encoding by rescaling each input
+        # dimension's phases, so the per-dimension phase components are a
+        # constant of the fit.  Precompute them once; every iterate is then
+        # an elementwise rescale, a sum over dimensions, and one inverse
+        # FFT, with no repeated phase matrix product.
+        phase_components = self.phase_matrix[:,:,None] * init_xs.T[None,:,:]
+
         def min_func(length_scale):
-            init_phis = self.encode(init_xs/ length_scale)
-            W = np.linalg.pinv(init_phis.T) @ init_ys
-            mu = np.dot(init_phis.T,W)
-            diff = init_ys - mu.T
+            phases = np.sum(phase_components / np.abs(length_scale).reshape(1,-1,1), axis=1)
+            init_phis = scipy.fft.ifft( np.exp(1.j * phases), axis=0, workers=-1 ).real.T
+            # lstsq solves the least-squares fit directly instead of
+            # forming the pseudo-inverse with a full SVD every iterate.
+            W, *_ = np.linalg.lstsq(init_phis, init_ys, rcond=None)
+            mu = np.dot(init_phis, W)
+            diff = init_ys - mu
             err = np.sum(np.power(diff, 2))
             return err
 
@@ -112,9 +133,15 @@ class SSPSpace:
         ls_mat = np.atleast_2d(np.diag(1/self.length_scale.flatten()))
         assert ls_mat.shape == (self.domain_dim, self.domain_dim), f'Expected Len Scale mat with dimensions {(self.domain_dim, self.domain_dim)}, got {ls_mat.shape}'
         scaled_x = x @ ls_mat
-        data = np.fft.ifft( np.exp( 1.j * self.phase_matrix @ scaled_x.T), axis=0 ).real
-        return data.T
-    
+        if _encode_numba.HAS_NUMBA:
+            fdata = _encode_numba.fourier_encode(self.phase_matrix, scaled_x)
+        else:
+            fdata = np.exp( 1.j * self.phase_matrix @ scaled_x.T)
+        # scipy.fft reuses its plan for the fixed transform length and
+        # splits batched transforms across all cores.
+        data = scipy.fft.ifft( fdata, axis=0, workers=-1 ).real
+        return data.T.astype(self.dtype, copy=False)
+
     def encode_and_deriv(self,x):
         '''
         Returns the ssp representation of the data and the derivative of
@@ -132,20 +159,22 @@ class SSPSpace:
             data
 
         grad : np.ndarray
-            A (num_samples, ssp_dim, domain_dim) array of the ssp representation of the data
+            A (num_samples, ssp_dim, domain_dim) array of the derivative of
+            the ssp representation with respect to the input data.
 
         '''
         assert x.ndim == 2, f'Expected 2d data (samples, features), got {x.ndim}d data.'
-        assert x.shape[1] == self.phase_matrix.shape[1], (f'Expected data to have ' 
+        assert x.shape[1] == self.phase_matrix.shape[1], (f'Expected data to have '
                                                          f'{self.phase_matrix.shape[1]} '
                                                          f'features, got {x.shape[1]}.')
 
 #         x= x.reshape(self.domain_dim, -1)
-        ls_mat = np.atleast_2d(np.diag(1 / self.length_scale))
+        ls_mat = np.atleast_2d(np.diag(1 / self.length_scale.flatten()))
         scaled_x = x @ ls_mat
-        data = np.fft.ifft( np.exp( 1.j * self.phase_matrix @ scaled_x.T ), axis=0 ).real
-        ddata = np.fft.ifft( 1.j * (self.phase_matrix @ ls_mat) @ np.exp( 1.j * self.phase_matrix @ scaled_x.T ), axis=0 ).real
-        return data.T, ddata.T
+        fdata = np.exp( 1.j * self.phase_matrix @ scaled_x.T )
+        data = scipy.fft.ifft( fdata, axis=0, workers=-1 ).real
+        ddata = scipy.fft.ifft( 1.j * (self.phase_matrix @ ls_mat)[:,None,:] * fdata[:,:,None], axis=0, workers=-1 ).real
+        return data.T, ddata.transpose(1,0,2)
     
     def encode_fourier(self,x):
         assert x.ndim == 2, f'Expected 2d data (samples, features), got {x.ndim} data.'
@@ -208,11 +237,17 @@ class SSPSpace:
                              sampling_method='length-scale', 
                              num_samples=num_samples, samples=samples)
 
+            # Return the similarity and its closed-form gradient so
+            # L-BFGS-B does not have to fall back on finite differences,
+            # which would cost domain_dim extra encodes per iterate.
             def min_func(x,target=ssp):
-                x_ssp = self.encode(np.atleast_2d(x))
-                return -np.inner(x_ssp, target).flatten()
+                x_ssp, dx_ssp = self.encode_and_deriv(np.atleast_2d(x))
+                val = -np.inner(x_ssp, target).flatten()
+                grad = -(target @ dx_ssp[0,...]).flatten()
+                return val, grad
 
-            soln = minimize(min_func, x0, 
+            soln = minimize(min_func, x0,
+                            jac=True,
                             method='L-BFGS-B',
                             bounds=self.domain_bounds)
             return soln.x
@@ -358,7 +393,7 @@ class RandomSSPSpace(SSPSpace):
     '''
     Creates an SSP space using randomly generated frequency components.
     '''
-    def __init__(self, domain_dim: int, ssp_dim: int,  domain_bounds=None, length_scale=1, rng=np.random.default_rng()):
+    def __init__(self, domain_dim: int, ssp_dim: int,  domain_bounds=None, length_scale=1, dtype=np.float64, rng=np.random.default_rng()):
 #         partial_phases = rng.random.rand(ssp_dim//2,domain_dim)*2*np.pi - np.pi
         
         
@@ -391,49 +426,36 @@ class RandomSSPSpace(SSPSpace):
             axis_matrix[:,i] = make_good_unitary(ssp_dim)
 
         super().__init__(domain_dim,axis_matrix.shape[0],axis_matrix=axis_matrix,
-                       domain_bounds=domain_bounds,length_scale=length_scale)
-        
+                       domain_bounds=domain_bounds,length_scale=length_scale,
+                       dtype=dtype)
+
 class HexagonalSSPSpace(SSPSpace):
     '''
     Creates an SSP space using the Hexagonal Tiling developed by NS Dumont 
     (2020)
     '''
-    def __init__(self,  domain_dim:int,ssp_dim: int=151, n_rotates:int=5, n_scales:int=5, 
+    def __init__(self,  domain_dim:int,ssp_dim: int=151, n_rotates:int=5, n_scales:int=5,
                  scale_min=0.1, scale_max=3,
-                 domain_bounds=None, length_scale=1):
+                 domain_bounds=None, length_scale=1, dtype=np.float64):
         if (n_rotates==5) & (n_scales==5) & (ssp_dim!=151): # user wants to define ssp with total dim, not number of simplex rotates and scales
             n_rotates = int(np.sqrt((ssp_dim-1)/(2*(domain_dim+1))))
             n_scales = n_rotates
             ssp_dim = n_rotates*n_scales*(domain_dim+1)*2 + 1
-            
-        phases_hex = np.hstack([np.sqrt(1+ 1/domain_dim)*np.identity(domain_dim) - (domain_dim**(-3/2))*(np.sqrt(domain_dim+1) + 1),
-                         (domain_dim**(-1/2))*np.ones((domain_dim,1))]).T
-        
+
         self.grid_basis_dim = domain_dim + 1
         self.num_grids = n_rotates*n_scales
 
-        scales = np.linspace(scale_min,scale_max,n_scales)
-        phases_scaled = np.vstack([phases_hex*i for i in scales])
-        
-        if (n_rotates==1):
-            phases_scaled_rotated = phases_scaled
-        elif (domain_dim==1):
-            scales = np.linspace(scale_min,scale_max,n_scales+n_rotates)
-            phases_scaled_rotated = np.vstack([phases_hex*i for i in scales])
-        elif (domain_dim == 2):
-            angles = np.linspace(0,2*np.pi/3,n_rotates,endpoint=False)
-            R_mats = np.stack([np.stack([np.cos(angles), -np.sin(angles)],axis=1),
-                        np.stack([np.sin(angles), np.cos(angles)], axis=1)], axis=1)
-            phases_scaled_rotated = (R_mats @ phases_scaled.T).transpose(0,2,1).reshape(-1,domain_dim)
-        else:
-            R_mats = special_ortho_group.rvs(domain_dim, size=n_rotates)
-            phases_scaled_rotated = (R_mats @ phases_scaled.T).transpose(0,2,1).reshape(-1,domain_dim)
-        
-        axis_matrix = _constructaxisfromphases(phases_scaled_rotated)
+        # The basis only depends on the construction parameters, so agents
+        # built with the same configuration (e.g. across trials of an
+        # experiment) share one cached copy instead of rebuilding it.
+        axis_matrix = np.copy(_hexagonal_axis_matrix(domain_dim, n_rotates,
+                                                     n_scales, scale_min,
+                                                     scale_max))
         ssp_dim = axis_matrix.shape[0]
         super().__init__(domain_dim,ssp_dim,axis_matrix=axis_matrix,
-                       domain_bounds=domain_bounds,length_scale=length_scale)
-  
+                       domain_bounds=domain_bounds,length_scale=length_scale,
+                       dtype=dtype)
+
     def sample_grid_encoders(self, n):
         sample_pts = self.get_sample_points(n)
         N = self.num_grids
@@ -528,12 +550,43 @@ class RdSSPSpace(SSPSpace):
         
         
     
+@functools.lru_cache(maxsize=32)
+def _hexagonal_axis_matrix(domain_dim, n_rotates, n_scales, scale_min, scale_max):
+    # Builds (and caches) the axis vectors for a hexagonal tiling with the
+    # given configuration.  Callers must copy the returned array before
+    # mutating it.
+    phases_hex = np.hstack([np.sqrt(1+ 1/domain_dim)*np.identity(domain_dim) - (domain_dim**(-3/2))*(np.sqrt(domain_dim+1) + 1),
+                     (domain_dim**(-1/2))*np.ones((domain_dim,1))]).T
+
+    # Scale the simplex phases by broadcasting rather than stacking a
+    # list of per-scale copies.
+    scales = np.linspace(scale_min,scale_max,n_scales)
+    phases_scaled = (scales[:,None,None] * phases_hex[None,:,:]).reshape(-1,domain_dim)
+
+    if (n_rotates==1):
+        phases_scaled_rotated = phases_scaled
+    elif (domain_dim==1):
+        scales = np.linspace(scale_min,scale_max,n_scales+n_rotates)
+        phases_scaled_rotated = (scales[:,None,None] * phases_hex[None,:,:]).reshape(-1,domain_dim)
+    elif (domain_dim == 2):
+        angles = np.linspace(0,2*np.pi/3,n_rotates,endpoint=False)
+        R_mats = np.stack([np.stack([np.cos(angles), -np.sin(angles)],axis=1),
+                    np.stack([np.sin(angles), np.cos(angles)], axis=1)], axis=1)
+        phases_scaled_rotated = (R_mats @ phases_scaled.T).transpose(0,2,1).reshape(-1,domain_dim)
+    else:
+        R_mats = special_ortho_group.rvs(domain_dim, size=n_rotates)
+        phases_scaled_rotated = (R_mats @ phases_scaled.T).transpose(0,2,1).reshape(-1,domain_dim)
+
+    return _constructaxisfromphases(phases_scaled_rotated)
+
 def _constructaxisfromphases(K):
     d = K.shape[0]
     F = np.ones((d*2 + 1,K.shape[1]), dtype="complex")
     F[0:d,:] = np.exp(1.j*K)
     F[-d:,:] = np.flip(np.conj(F[0:d,:]),axis=0)
-    axes =  np.fft.ifft(np.fft.ifftshift(F,axes=0),axis=0).real
+    # .real is a strided view into the complex result; return a
+    # C-contiguous copy so downstream encodes get a dense basis.
+    axes =  np.ascontiguousarray(np.fft.ifft(np.fft.ifftshift(F,axes=0),axis=0).real)
     return axes
 
 def _get_sub_FourierSSP(n, N, sublen=3):